@@ -1,22 +1,60 @@
 import os
 import re
-import xml.sax.saxutils as saxutils
-import xml.dom.minidom as minidom
 import xml.etree.ElementTree as ET
+import xml.parsers.expat as expat
 import hashlib
 from ACIP import ACIPtoEWTS
 import pyewts
-import glob
 from pathlib import Path
 import logging
 from tqdm import tqdm
 import shutil
 import csv
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 
 converter = pyewts.pyewts()
 
+TEI_NS = "http://www.tei-c.org/ns/1.0"
+
+
+_TAG_RE = re.compile(r'(<[^>]+>)')
+_PAREN_RE = re.compile(r'\(([^)]*)\)', re.DOTALL)
+# editorial comments [#...] and the fixed editorial markers, in one pass
+_EDIT_RE = re.compile(r'\[#(.*?)\]|\[LL\]|\[DR\]|\{DD\}')
+_EDITORIAL_MARKERS = {
+    "[LL]": "Landza script on page",
+    "[DR]": "picture on page",
+    "{DD}": "picture on page",
+}
+_DD_RE = re.compile(r'\[DD\d?\] ?([^[]+)')
+_VARIANT_RE = re.compile(r'(?:^|\s+)(\S+)\s*\[([^\]]+)\]')
+_UNCLEAR_RE = re.compile(r'\[([^\]]+)\]')
+_PAGE_SPLIT_RE = re.compile(r'(@+\S+)')
+_PAGE_HEAD_RE = re.compile(r'@+(\S+)')
+_NONASCII_RE = re.compile(r'[^\x09\x0A\x0D\x20-\x7E]')
+_NLSPACE_RE = re.compile(r'\n +')
+_CLEANPG_RE = re.compile(r'[^0-9ab]')
+
+# a text fragment ending with one of these ends with a shad
+_SHAD_TERMINATORS = ",`;"
+
+# [...] containing one of these is an editorial note rather than an unclear reading
+_UNCLEAR_NOTE_KEYS = ("page", "text", "missing ")
+
 PAGE_COUNT = 0
 
+# ACIP fragment -> (EWTS starts with a space, Unicode), shared by all the files of a process
+_ACIP_CACHE = {}
+ACIP_CACHE_SIZE = 262144
+# fragments longer than this are mostly unique, caching them would only evict useful entries
+ACIP_CACHE_MAX_LEN = 256
+# cannot appear in sanitized input, used to convert many fragments in one call
+_FRAGMENT_SEP = '\x01'
+# ACIP rules on these characters can span several fragments, so fragments
+# containing them are converted on their own
+_UNBATCHABLE_CHARS = frozenset('[]@/')
+
 def calculate_sha256(filepath):
     """
     Calculate SHA256 checksum of a file.
@@ -27,53 +65,45 @@ def calculate_sha256(filepath):
     Returns:
         str: SHA256 hexadecimal digest
     """
-    sha256_hash = hashlib.sha256()
     with open(filepath, "rb") as f:
-        # Read and update hash string value in blocks of 4K
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
+        if hasattr(hashlib, "file_digest"):
+            # Python >= 3.11, the read loop runs in C
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        sha256_hash = hashlib.sha256()
+        # Read and update hash string value in blocks of 1M
+        buf = bytearray(1 << 20)
+        view = memoryview(buf)
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            sha256_hash.update(view[:n])
     return sha256_hash.hexdigest()
 
 def is_valid_xml(xml_string):
+    # Parse XML to validate it, expat alone is enough since we don't need the tree.
+    # The namespace separator is the one ElementTree uses, so that unbound
+    # prefixes are still rejected
+    parser = expat.ParserCreate(namespace_separator='}')
     try:
-        # Parse XML to validate it
-        root = ET.fromstring(xml_string)
-        
-        # Use minidom to create a pretty-printed version
-        parsed_xml = minidom.parseString(ET.tostring(root, encoding='unicode'))
+        parser.Parse(xml_string, True)
         return True
-    
-    except Exception as e:
+    except expat.ExpatError:
         return False
 
-def validate_and_normalize_xml(xml_string):
+def escape_xml(text):
     """
-    Validates an XML string and returns a normalized, well-indented version.
-    
-    Args:
-        xml_string (str): The XML string to validate and normalize
-        
-    Returns:
-        Tuple[bool, str]: A tuple containing:
-            - bool: True if valid XML, False otherwise
-            - str: Normalized XML string if valid, error message if invalid
+    Same as xml.sax.saxutils.escape, for element content. A replacement
+    is only done when the character is present: str.replace is much
+    slower than an `in` test on Tibetan strings, even when nothing matches.
     """
-    try:
-        # Parse XML to validate it
-        ET.register_namespace("", "http://www.tei-c.org/ns/1.0")
-        root = ET.fromstring(xml_string)
-        
-        # Use minidom to create a pretty-printed version
-        parsed_xml = minidom.parseString(ET.tostring(root, encoding='unicode'))
-        #normalized_xml = parsed_xml.toprettyxml(indent="")
-        
-        # Remove extra blank lines that minidom sometimes adds
-        #normalized_xml = '\n'.join([line for line in normalized_xml.split('\n') if line.strip()])
-        return True, xml_string
-    
-    except Exception as e:
-        logging.error(e)
-        return False, f"Invalid XML: {str(e)}"
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
 
 def balance_parentheses(text, c1, c2):
     """
@@ -86,8 +116,11 @@ def balance_parentheses(text, c1, c2):
         str: Text with balanced parentheses
     """
     # Track open and closed parentheses
+    # (str.count runs in C, two of them are faster than one pass in Python)
     open_count = text.count(c1)
     close_count = text.count(c2)
+    if open_count == close_count:
+        return text
     
     # Add missing closing or opening parentheses
     if open_count > close_count:
@@ -97,42 +130,199 @@ def balance_parentheses(text, c1, c2):
     
     return text
 
-def ACIP_transform(s, last_is_shad=False):
-    s = ACIPtoEWTS(s)
+def collapse_spaces(text):
+    """Collapse runs of spaces into a single space."""
+    while '  ' in text:
+        text = text.replace('  ', ' ')
+    return text
+
+def _acip_to_unicode(s):
+    return _ewts_to_unicode(ACIPtoEWTS(s))
+
+def _ewts_to_unicode(s):
     startswithspace = s.startswith(" ")
     s = converter.toUnicode(s)
     # normalize punctuation:
     s = s.replace("ང།", "ང་།")
+    return startswithspace, s
+
+def _acip_to_unicode_batch(parts):
+    """
+    Same as _acip_to_unicode on each part, but with only one ACIPtoEWTS call
+    for all the parts. pyewts keeps state across a string (leading spaces,
+    invalid syllables), so it still gets one call per part.
+    """
+    ewts_parts = ACIPtoEWTS(_FRAGMENT_SEP.join(parts)).split(_FRAGMENT_SEP)
+    if len(ewts_parts) != len(parts):
+        # the separator got lost somewhere, better safe than sorry
+        return [_acip_to_unicode(s) for s in parts]
+    return [_ewts_to_unicode(s) for s in ewts_parts]
+
+def _cache_acip(s, res):
+    if len(s) > ACIP_CACHE_MAX_LEN:
+        return
+    if len(_ACIP_CACHE) >= ACIP_CACHE_SIZE:
+        _ACIP_CACHE.clear()
+    _ACIP_CACHE[s] = res
+
+def _with_shad(res, last_is_shad):
+    startswithspace, s = res
     if startswithspace:
         s = ('་' if not last_is_shad else ' ')+s
     return s
 
+def ACIP_transform(s, last_is_shad=False):
+    res = _ACIP_CACHE.get(s)
+    if res is None:
+        res = _acip_to_unicode(s)
+        _cache_acip(s, res)
+    return _with_shad(res, last_is_shad)
+
+def ACIP_transform_many(parts):
+    """
+    Convert a list of (fragment, last_is_shad), the fragments that are not
+    cached are converted together.
+    """
+    results = [_ACIP_CACHE.get(s) for s, _ in parts]
+    to_batch = []
+    for i, (s, _) in enumerate(parts):
+        if results[i] is not None:
+            continue
+        if _UNBATCHABLE_CHARS.isdisjoint(s):
+            to_batch.append(i)
+        else:
+            results[i] = _acip_to_unicode(s)
+            _cache_acip(s, results[i])
+    if to_batch:
+        batch_res = _acip_to_unicode_batch([parts[i][0] for i in to_batch])
+        for i, res in zip(to_batch, batch_res):
+            results[i] = res
+            _cache_acip(parts[i][0], res)
+    return [_with_shad(res, last_is_shad) for res, (_, last_is_shad) in zip(results, parts)]
+
 def convert_text_components(text):
-    tag_pattern = re.compile(r'(<[^>]+>)')
-    
     def should_skip_tag(tag):
         return 'xml:lang="en"' in tag
     
-    parts = tag_pattern.split(text)
-    
     result = []
+    # (index in result, text, last_is_shad), converted in one batch at the end
+    to_convert = []
     skip = False
     last_is_shad = False
-    
-    for part in parts:
-        if tag_pattern.match(part):  # It's a tag
-            result.append(part)
-            skip = should_skip_tag(part)
-        else:  # It's text
-            r = part if skip else ACIP_transform(part, last_is_shad)
-            if last_is_shad:
-                r = ' '+r
-            last_is_shad = not skip and len(part) and part[-1] in [',', '`', '`', ';']
-            r = saxutils.escape(r)
-            result.append(r)
+
+    def add_part(part):
+        # It's text
+        nonlocal last_is_shad
+        if skip:
+            result.append(escape_xml(' '+part if last_is_shad else part))
+        else:
+            to_convert.append((len(result), part, last_is_shad))
+            result.append(None)
+        last_is_shad = not skip and bool(part) and part[-1] in _SHAD_TERMINATORS
+    
+    # single pass over the tags, collecting the (possibly empty) text between them
+    pos = 0
+    for m in _TAG_RE.finditer(text):
+        add_part(text[pos:m.start()])
+        tag = m.group(0)
+        result.append(tag)
+        skip = should_skip_tag(tag)
+        pos = m.end()
+    add_part(text[pos:])
+
+    converted = ACIP_transform_many([(part, shad) for _, part, shad in to_convert])
+    for (i, _, shad), r in zip(to_convert, converted):
+        if shad:
+            r = ' '+r
+        result[i] = escape_xml(r)
     
     return ''.join(result)
 
+def _replace_parentheses(match):
+    # Handle parenthesized text as small text
+    if not match.group(1):
+        return ''
+    return f'<hi rend="small">{match.group(1)}</hi>'
+
+def _replace_editorial(match):
+    # transform editorial comments [#...]
+    comment = match.group(1)
+    if comment is not None:
+        # {DD} is also replaced inside comments (a [#...] comment can't
+        # contain the other markers, they would end it)
+        if "{DD}" in comment:
+            comment = comment.replace("{DD}", f'<note type="editorial" xml:lang="en">{_EDITORIAL_MARKERS["{DD}"]}</note>')
+        return f'<note type="editorial" xml:lang="en">{comment}</note>'
+    return f'<note type="editorial" xml:lang="en">{_EDITORIAL_MARKERS[match.group(0)]}</note>'
+
+def _replace_variant(match):
+    # Replace (xxx)[yyy] with <choice>
+    orig = match.group(1).strip()
+    corr = match.group(2).strip()
+    
+    # Ignore * at the beginning of corrections
+    corr = corr.lstrip('*')
+    
+    # Add cert attribute for corrections ending with ?
+    cert_attr = ' cert="low"' if corr.endswith('?') else ''
+    corr = corr.rstrip('?')
+    
+    return f'<choice><orig>{orig}</orig><corr{cert_attr}>{corr}</corr></choice>'
+
+def _replace_unclear(match):
+    # Replace [xxx] with <unclear>
+    text = match.group(1).strip()
+    if text == '?':
+        return '<gap reason="illegible" unit="syllable" quantity="1"/>'
+    tlower = text.lower()
+    if any(k in tlower for k in _UNCLEAR_NOTE_KEYS):
+        return '<note type="editorial" xml:lang="en">'+escape_xml(text.strip(" #!*[]()&"))+'</note>'
+    text = text.rstrip('?')
+    return f'<unclear reason="illegible" cert="low">{text}</unclear>'
+
+def _make_line_converter(variant_mode):
+    """
+    Returns a function converting a single line for the given variant mode,
+    see convert_line. The variant mode is fixed for a whole file, so this is
+    called once per file rather than testing the mode on each line.
+    """
+    if variant_mode == 1:
+        variant_re, replace_variant = _VARIANT_RE, _replace_variant
+    else:
+        variant_re, replace_variant = _UNCLEAR_RE, _replace_unclear
+
+    def line_converter(line_str):
+        line_str = line_str.strip(" \t\n\r")
+
+        # add a tsheg at the end
+        if line_str and (line_str[-1].isalpha() or line_str[-1] == "'"):
+            line_str += ' '
+
+        original_line_str = line_str
+        
+        line_str = balance_parentheses(line_str, '[', ']')
+
+        # Add line breaks
+        line_str = '<lb/>'+line_str
+
+        line_str = line_str.replace('[?]', '<gap reason="illegible" unit="syllable" quantity="1"/>')
+        line_str = _PAREN_RE.sub(_replace_parentheses, line_str)
+        line_str = _EDIT_RE.sub(_replace_editorial, line_str)
+        line_str = _DD_RE.sub(r'<figure><head>\1</head></figure>', line_str)
+        line_str = variant_re.sub(replace_variant, line_str)
+
+        line_str = convert_text_components(line_str)
+        
+        if not is_valid_xml(f'<p xmlns="{TEI_NS}">{line_str}</p>'):
+            #logging.warning("could not make valid XML from "+original_line_str)
+            line_str = ACIP_transform(original_line_str).strip()
+            line_str = escape_xml(line_str)
+            return line_str
+
+        return line_str.strip()
+
+    return line_converter
+
 def convert_line(line_str, variant_mode=0):
     """
     Convert a single line to TEI-compatible text.
@@ -146,79 +336,7 @@ def convert_line(line_str, variant_mode=0):
     Returns:
         str: Converted line with TEI markup
     """
-    # Escape XML special characters
-
-    line_str = line_str.strip(" \t\n\r")
-
-    # add a tsheg at the end
-    if line_str and (line_str[-1].isalpha() or line_str[-1] == "'"):
-        line_str += ' '
-
-    original_line_str = line_str
-    
-    line_str = balance_parentheses(line_str, '[', ']')
-
-    # Add line breaks
-    line_str = '<lb/>'+line_str
-
-    line_str = line_str.replace('[?]', '<gap reason="illegible" unit="syllable" quantity="1"/>')
-    
-    # Handle parenthesized text as small text
-    def replace_parentheses(match):
-        if not match.group(1):
-            return ''
-        return f'<hi rend="small">{match.group(1)}</hi>'
-    
-    line_str = re.sub(r'\(([^)]*)\)', replace_parentheses, line_str, flags=re.DOTALL)
-
-    # transform editorial comments [#...]
-    line_str = re.sub(r'\[#(.*?)\]', r'<note type="editorial" xml:lang="en">\1</note>', line_str)
-    line_str = line_str.replace("[LL]", '<note type="editorial" xml:lang="en">Landza script on page</note>')
-    line_str = line_str.replace("[DR]", '<note type="editorial" xml:lang="en">picture on page</note>')
-    line_str = line_str.replace('{DD}', '<note type="editorial" xml:lang="en">picture on page</note>')
-    line_str = re.sub(r'\[DD\d?\] ?([^[]+)', r'<figure><head>\1</head></figure>', line_str)
-    
-    # Handle variant modes if specified
-    if variant_mode == 1:
-        # Replace (xxx)[yyy] with <choice>
-        def replace_variant(match):
-            orig = match.group(1).strip()
-            corr = match.group(2).strip()
-            
-            # Ignore * at the beginning of corrections
-            corr = corr.lstrip('*')
-            
-            # Add cert attribute for corrections ending with ?
-            cert_attr = ' cert="low"' if corr.endswith('?') else ''
-            corr = corr.rstrip('?')
-            
-            return f'<choice><orig>{orig}</orig><corr{cert_attr}>{corr}</corr></choice>'
-        
-        line_str = re.sub(r'(?:^|\s+)(\S+)\s*\[([^\]]+)\]', replace_variant, line_str)
-    
-    else:
-        # Replace [xxx] with <unclear>
-        def replace_unclear(match):
-            text = match.group(1).strip()
-            if text == '?':
-                return '<gap reason="illegible" unit="syllable" quantity="1"/>'
-            tlower = text.lower()
-            if "page" in tlower or "text" in tlower or "missing "in tlower:
-                return '<note type="editorial" xml:lang="en">'+saxutils.escape(text.strip(" #!*[]()&"))+'</note>'
-            text = text.rstrip('?')
-            return f'<unclear reason="illegible" cert="low">{text}</unclear>'
-        
-        line_str = re.sub(r'\[([^\]]+)\]', replace_unclear, line_str)
-
-    line_str = convert_text_components(line_str)
-    
-    if not is_valid_xml("<p>"+line_str+"</p>"):
-        #logging.warning("could not make valid XML from "+original_line_str)
-        line_str = ACIP_transform(original_line_str).strip()
-        line_str = saxutils.escape(line_str)
-        return line_str
-
-    return line_str.strip()
+    return _make_line_converter(variant_mode)(line_str)
 
 def parse_document(content):
     """
@@ -228,14 +346,16 @@ def parse_document(content):
         content (str): Full text content of the document
     
     Returns:
-        list: List of page dictionaries with 'number' and 'content' keys
+        Tuple[list, int]: A tuple containing:
+            - list: List of page dictionaries with 'number' and 'content' keys
+            - int: Number of page breaks found
     """
-    global PAGE_COUNT
+    page_count = 0
     # Balance parentheses in the entire document
     content = balance_parentheses(content, '(', ')')
     
     # Split content by page markers
-    page_splits = re.split(r'(@+\S+)', content)
+    page_splits = _PAGE_SPLIT_RE.split(content)
     
     pages = []
     current_page = None
@@ -243,14 +363,14 @@ def parse_document(content):
 
     for part in page_splits:
         # Check if this is a page marker
-        page_match = re.match(r'@+(\S+)', part)
+        page_match = _PAGE_HEAD_RE.match(part)
         if page_match:
             if current_page is not None or current_content:
                 pages.append({
                     'number': clean_page_number(current_page),
                     'content': current_content
                 })
-                PAGE_COUNT += 1
+                page_count += 1
             current_content = []
             # Start new page
             current_page = page_match.group(1)
@@ -258,7 +378,7 @@ def parse_document(content):
             # Accumulate content for current page
             if part.strip():
                 # Split into paragraphs (double newlines)
-                paras = [p.replace('\n', ' ').replace('  ', ' ').strip() for p in part.split('\n\n') if p.strip()]
+                paras = [collapse_spaces(p.replace('\n', ' ')).strip() for p in part.split('\n\n') if p.strip()]
                 current_content.extend(paras)
 
     # Add last page if exists
@@ -273,17 +393,17 @@ def parse_document(content):
         pages[0]['number'] = '1a'
         pages[1]['number'] = '1b'
 
-    return pages
+    return pages, page_count
 
 def clean_page_number(page_num):
     """Remove leading zeros from page number."""
     if page_num is None:
         return None
     page_num = page_num.lstrip('0').lower()
-    page_num = re.sub(r'[^0-9ab]', '', page_num)
+    page_num = _CLEANPG_RE.sub('', page_num)
     return page_num
 
-PROPER_EMENDATIONS = [
+PROPER_EMENDATIONS = frozenset({
     "S00202E",
     "S00057M",
     "S00034N",
@@ -296,9 +416,9 @@ PROPER_EMENDATIONS = [
     "SP05939N",
     "ST00024N",
     "SL05414N"
-]
+})
 
-IN_ENGLISH = [
+IN_ENGLISH = frozenset({
     "S00200A",
     "S00199A",
     "R0050A",
@@ -311,7 +431,7 @@ IN_ENGLISH = [
     "S00205A",
     "S00036F",
     "S00039F",
-]
+})
 
 def sanitize_str(s):
     """
@@ -322,43 +442,94 @@ def sanitize_str(s):
     # #x9 | #xA | #xD | [#x20-#xD7FF] | [#xE000-#xFFFD] | [#x10000-#x10FFFF]
     #s = re.sub(r'[^\x09\x0A\x0D\x20-\uD7FF\uE000-\uFFFD\U00010000-\U0010FFFF]', '', s)
     # we also just remove all non-ASCII characters (after a manual confirmation that they're all erroneous)
-    s = re.sub(r'[^\x09\x0A\x0D\x20-\x7E]', '', s)
+    s = _NONASCII_RE.sub('', s)
     # normalize line breaks:
     s = s.replace('\r\n', '\n').replace('\r', '\n')
     # remove spaces after line break
-    s = re.sub(r'\n +', '\n', s)
+    s = _NLSPACE_RE.sub('\n', s)
     # normalize spaces
-    s = re.sub(r'  +', ' ', s)
+    s = collapse_spaces(s)
     return s
 
-def convert_file(input_path, output_path, ie_lname, ve_lname, ut_lname, title):
+TEI_FOOTER = [
+    '</p>',
+    '    </body>',
+    '  </text>',
+    '</TEI>'
+]
+
+class TEIWriter:
+    """
+    Writes the lines of a TEI document to output_path as they come. When
+    validate is True, the lines are also fed to an XML parser, which raises
+    ET.ParseError if the document is not well-formed. The output file is
+    removed if anything fails before the document is complete.
+    """
+    def __init__(self, output_path, validate=False):
+        self.output_path = output_path
+        self.parser = ET.XMLPullParser() if validate else None
+        self.f = None
+        self.sep = ''
+
+    def __enter__(self):
+        self.f = open(self.output_path, 'w', encoding='utf-8', buffering=1 << 20)
+        return self
+
+    def write(self, line):
+        line = self.sep + line
+        self.sep = '\n'
+        self.f.write(line)
+        if self.parser is not None:
+            self.parser.feed(line)
+            # we only want well-formedness, don't keep the tree
+            for _, elem in self.parser.read_events():
+                elem.clear()
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None and self.parser is not None:
+                self.parser.close()
+        except ET.ParseError:
+            exc_type = ET.ParseError
+            raise
+        finally:
+            self.f.close()
+            if exc_type is not None:
+                os.remove(self.output_path)
+        return False
+
+def convert_file(input_path, output_path, ie_lname, ve_lname, ut_lname, title, validate_full=False):
     """
     Convert a single text file to TEI XML.
     
     Args:
         input_path (str): Path to input text file
         output_path (str): Path to output XML file
+        validate_full (bool): Check that the generated document is well-formed while writing it
+
+    Returns:
+        int: Number of page breaks in the document
     """
     basename = os.path.splitext(os.path.basename(input_path))[0]
     variant_mode = 1 if basename in PROPER_EMENDATIONS else 2
     lang = "en" if basename in IN_ENGLISH else "bo"
-    # Read the entire file
-    with open(input_path, 'r', encoding='utf-8') as f:
-        content = f.read()
+    # Read the entire file, and calculate the SHA256 checksum on the same bytes
+    with open(input_path, 'rb') as f:
+        raw = f.read()
+    file_checksum = hashlib.sha256(raw).hexdigest()
+    # sanitize_str normalizes the line breaks
+    content = raw.decode('utf-8')
 
     content = sanitize_str(content)
     
-    # Calculate SHA256 checksum
-    file_checksum = calculate_sha256(input_path)
-    
     # Get source filename (basename)
-    src_filename = saxutils.escape(os.path.basename(input_path))
+    src_filename = escape_xml(os.path.basename(input_path))
     
     # Parse document into pages
-    pages = parse_document(content)
+    pages, page_count = parse_document(content)
     
     # Create TEI XML structure
-    tei_content = [
+    tei_header = [
         '<?xml version="1.0" encoding="UTF-8"?>',
         '<TEI xmlns="http://www.tei-c.org/ns/1.0">',
         '  <teiHeader>',
@@ -388,67 +559,64 @@ def convert_file(input_path, output_path, ie_lname, ve_lname, ut_lname, title):
         '      <p xml:space="preserve">'
     ]
 
-    # TODO: make the p, pb and first lb on the same txt line
-    
-    # Add pages and paragraphs
-    for page in pages:
-        is_blank = len(page['content']) == 1 and ("MISSING PAGE" in page['content'][0] or "BLANK PAGE" in page['content'][0] or "[BP]" in page['content'][0])
-        pnum_attribute = "" if not page["number"] else f' n="{page["number"]}"'
-        if is_blank:
-            tei_content.append(f'<pb{pnum_attribute} rend="blank"/>')
-            continue
-
-        tei_content.append(f'<pb{pnum_attribute}/>')
+    line_converter = _make_line_converter(variant_mode)
 
-        # Convert and add paragraphs
-        for p in page['content']:
-            converted_p = convert_line(p, variant_mode)
-            if converted_p:
-                tei_content.append(f'{converted_p}')
-    
-    # Finish TEI structure
-    tei_content.extend([
-        '</p>',
-        '    </body>',
-        '  </text>',
-        '</TEI>'
-    ])
-    
-    # Join the content
-    xml_content = '\n'.join(tei_content)
+    # TODO: make the p, pb and first lb on the same txt line
     
-    # Validate XML before writing
-    valid_xml, indented_xml = validate_and_normalize_xml(xml_content)
-    if not valid_xml:
+    try:
+        with TEIWriter(output_path, validate_full) as tei:
+            for line in tei_header:
+                tei.write(line)
+
+            # Add pages and paragraphs
+            for page in pages:
+                is_blank = len(page['content']) == 1 and ("MISSING PAGE" in page['content'][0] or "BLANK PAGE" in page['content'][0] or "[BP]" in page['content'][0])
+                pnum_attribute = "" if not page["number"] else f' n="{page["number"]}"'
+                if is_blank:
+                    tei.write(f'<pb{pnum_attribute} rend="blank"/>')
+                    continue
+
+                tei.write(f'<pb{pnum_attribute}/>')
+
+                # Convert and add paragraphs
+                for p in page['content']:
+                    converted_p = line_converter(p)
+                    if converted_p:
+                        tei.write(f'{converted_p}')
+
+            # Finish TEI structure
+            for line in TEI_FOOTER:
+                tei.write(line)
+    except ET.ParseError as e:
+        logging.error(e)
         raise ValueError(f"Generated XML is not well-formed for {input_path}")
-    
-    # Write to output file
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(indented_xml)
 
-def convert_file_not_transcript(input_path, output_path, ie_lname, ve_lname, ut_lname, title, lang="en"):
+    return page_count
+
+def convert_file_not_transcript(input_path, output_path, ie_lname, ve_lname, ut_lname, title, lang="en", validate_full=False):
     """
     Convert a single text file to TEI XML.
     
     Args:
         input_path (str): Path to input text file
         output_path (str): Path to output XML file
+        validate_full (bool): Check that the generated document is well-formed while writing it
     """
-    # Read the entire file
-    with open(input_path, 'r', encoding='utf-8') as f:
-        content = f.read()
+    # Read the entire file, and calculate the SHA256 checksum on the same bytes
+    with open(input_path, 'rb') as f:
+        raw = f.read()
+    file_checksum = hashlib.sha256(raw).hexdigest()
+    # sanitize_str normalizes the line breaks
+    content = raw.decode('utf-8')
 
     content = sanitize_str(content)
-    content = saxutils.escape(content)
-    
-    # Calculate SHA256 checksum
-    file_checksum = calculate_sha256(input_path)
+    content = escape_xml(content)
     
     # Get source filename (basename)
-    src_filename = saxutils.escape(os.path.basename(input_path))
+    src_filename = escape_xml(os.path.basename(input_path))
 
     # Create TEI XML structure
-    tei_content = [
+    tei_header = [
         '<?xml version="1.0" encoding="UTF-8"?>',
         '<TEI xmlns="http://www.tei-c.org/ns/1.0">',
         '  <teiHeader>',
@@ -478,27 +646,17 @@ def convert_file_not_transcript(input_path, output_path, ie_lname, ve_lname, ut_
         '      <p xml:space="preserve">'
     ]
     
-    tei_content.append(content)
-
-    # Finish TEI structure
-    tei_content.extend([
-        '</p>',
-        '    </body>',
-        '  </text>',
-        '</TEI>'
-    ])
-    
-    # Join the content
-    xml_content = '\n'.join(tei_content)
-    
-    # Validate XML before writing
-    valid_xml, indented_xml = validate_and_normalize_xml(xml_content)
-    if not valid_xml:
+    try:
+        with TEIWriter(output_path, validate_full) as tei:
+            for line in tei_header:
+                tei.write(line)
+            tei.write(content)
+            # Finish TEI structure
+            for line in TEI_FOOTER:
+                tei.write(line)
+    except ET.ParseError as e:
+        logging.error(e)
         raise ValueError(f"Generated XML is not well-formed for {input_path}")
-    
-    # Write to output file
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(indented_xml)
 
 def main():
     """
@@ -530,7 +688,7 @@ def main():
             
             logging.info(f'Converted {filename} to multiple variants')
 
-NOT_TRANSCRIPTS = [
+NOT_TRANSCRIPTS = frozenset({
     "S00200A", # MW1AL4
     "S00199A", # ?
     "R0050A", # ?
@@ -544,7 +702,7 @@ NOT_TRANSCRIPTS = [
     "S00034F",
     "S00036F",
     "S00039F",
-]
+})
 
 PREDEFINED_MW = {
     "S00200A": "MW1AL4",
@@ -621,7 +779,6 @@ GROUPS = {
     "D88299": [["SE00070I1", "SE0070M2"]],
     "D88300": [["SL00070N1", "SL00070I2"]],
     "D04848": [["SE00023M1", "SE00023M2"]],
-    "D04849": [["SL00023N1", "SL00023N2", "S00023N3", "S00023N4"]],
     "D79973": [["R00003E1"], ["R00003E2"], ["R00003E3"]],
     "D50934": [
         ["R0002K", "R0002KH", "R0002G", "R0002NG", "R0002C", "R0002CH", "R0002J", "R0002NY"],
@@ -650,62 +807,105 @@ GROUPS = {
     "D59861": [["S5275M85-1", "S5275M85-2"]],
 }
 
-TITLES = {}
-with open("ALL catalog - Catalog.csv", 'r', encoding='utf-8') as file:
-    reader = csv.reader(file)
-    for row in reader:
-        if row[9]:
-            title = converter.toUnicode(row[9])
-            TITLES[row[12]] = title
+class LazyTitles:
+    """
+    Titles indexed by catalog row id, the EWTS of the catalog is only
+    converted to Unicode on first lookup. Only supports `in` and [].
+    """
+    def __init__(self, raw_titles):
+        self.raw_titles = raw_titles
+        self.titles = {}
+
+    def __contains__(self, row_id):
+        return row_id in self.raw_titles
+
+    def __getitem__(self, row_id):
+        title = self.titles.get(row_id)
+        if title is None:
+            raw_title = self.raw_titles[row_id]
+            title = converter.toUnicode(raw_title) if raw_title else row_id
+            self.titles[row_id] = title
+        return title
+
+TITLES = None
+
+def _load_titles():
+    global TITLES
+    if TITLES is not None:
+        return
+    raw_titles = {}
+    with open("ALL catalog - Catalog.csv", 'r', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        for row in reader:
+            raw_titles[row[12]] = row[9]
+    TITLES = LazyTitles(raw_titles)
+
+CONVERTED_ROOT = Path("texts_converted")
+
+def _process_one(file_path, rev_volume):
+    """
+    Copy and convert a single source file, returns (base, number of pages).
+    Runs in a worker process.
+    """
+    _load_titles()
+    base = file_path.stem.strip(" .")
+    title = base
+    if base in TITLES:
+        title = TITLES[base]
+    else:
+        logging.warning("no title for "+base)
+    default_id = "1AL"+base
+    ie_lname = "IE"+default_id
+    mw_lname = PREDEFINED_MW[base] if base in PREDEFINED_MW else "MW"+default_id
+    ve_lname = "VE"+default_id
+    ut_lname = "UT"+default_id+"_0001"
+    if base in rev_volume:
+        rev_volume_info = rev_volume[base]
+        default_id = "1AL"+rev_volume_info["d"]
+        ie_lname = "IE"+default_id
+        mw_lname = PREDEFINED_MW[base] if base in PREDEFINED_MW else "MW"+default_id
+        if rev_volume_info["nbvols"] > 1:
+            ve_lname = "VE"+default_id+("_%04d" % rev_volume_info["vol_i"])
         else:
-            TITLES[row[12]] = row[12]
+            ve_lname = "VE"+default_id
+        ut_lname = "UT"+ve_lname[2:]+("_%04d" % rev_volume_info["txt_i"])
+    path_to_output_file = CONVERTED_ROOT / ie_lname / "archive" / ve_lname / f"{ut_lname}.xml"
+    path_to_source_file = CONVERTED_ROOT / ie_lname / "sources" / ve_lname / f"{base}.txt"
+    path_to_output_file.parent.mkdir(parents=True, exist_ok=True)
+    path_to_source_file.parent.mkdir(parents=True, exist_ok=True)
+    # copy source file
+    shutil.copy(file_path, path_to_source_file)
+    #logging.info(f"Processing: {file_path}")
+    nb_pages = 0
+    try:
+        if base not in NOT_TRANSCRIPTS:
+            nb_pages = convert_file(file_path, str(path_to_output_file), ie_lname, ve_lname, ut_lname, title, validate_full=False)
+        else:
+            convert_file_not_transcript(file_path, str(path_to_output_file), ie_lname, ve_lname, ut_lname, title, validate_full=False)
+        #logging.info(f"Successfully processed: {file_path}")
+    except Exception as e:
+        logging.error(f"Error processing {file_path}: {str(e)}")
+    logging.debug(f"ACIP conversion cache: {len(_ACIP_CACHE)} entries")
+    return base, nb_pages
 
 def convert_all():
+    global PAGE_COUNT
+    _load_titles()
     rev_volume = {}
     for dnumber, vollist in GROUPS.items():
         nb_vols = len(vollist)
         for vol_i, txtlist in enumerate(vollist):
             for txt_i, txt in enumerate(txtlist):
                 rev_volume[txt] = {"d": dnumber, "vol_i": vol_i+1, "txt_i": txt_i+1, "nbvols": nb_vols}
-    txt_files = sorted(glob.glob("texts/*.txt"))
-    for file_path in tqdm(txt_files):
-        base = os.path.splitext(os.path.basename(file_path))[0]
-        base = base.strip(" .")
-        title = base
-        if base in TITLES:
-            title = TITLES[base]
-        else:
-            logging.warning("no title for "+base)
-        default_id = "1AL"+base
-        ie_lname = "IE"+default_id
-        mw_lname = PREDEFINED_MW[base] if base in PREDEFINED_MW else "MW"+default_id
-        ve_lname = "VE"+default_id
-        ut_lname = "UT"+default_id+"_0001"
-        if base in rev_volume:
-            rev_volume_info = rev_volume[base]
-            default_id = "1AL"+rev_volume_info["d"]
-            ie_lname = "IE"+default_id
-            mw_lname = PREDEFINED_MW[base] if base in PREDEFINED_MW else "MW"+default_id
-            if rev_volume_info["nbvols"] > 1:
-                ve_lname = "VE"+default_id+("_%04d" % rev_volume_info["vol_i"])
-            else:
-                ve_lname = "VE"+default_id
-            ut_lname = "UT"+ve_lname[2:]+("_%04d" % rev_volume_info["txt_i"])
-        path_to_output_file = Path(f"texts_converted/{ie_lname}/archive/{ve_lname}/{ut_lname}.xml")
-        path_to_source_file = Path(f"texts_converted/{ie_lname}/sources/{ve_lname}/{base}.txt")
-        path_to_output_file.parent.mkdir(parents=True, exist_ok=True)
-        path_to_source_file.parent.mkdir(parents=True, exist_ok=True)
-        # copy source file
-        shutil.copy(file_path, path_to_source_file)
-        #logging.info(f"Processing: {file_path}")
-        try:
-            if base not in NOT_TRANSCRIPTS:
-                convert_file(file_path, str(path_to_output_file), ie_lname, ve_lname, ut_lname, title)
-            else:
-                convert_file_not_transcript(file_path, str(path_to_output_file), ie_lname, ve_lname, ut_lname, title)
-            #logging.info(f"Successfully processed: {file_path}")
-        except Exception as e:
-            logging.error(f"Error processing {file_path}: {str(e)}")
+    # Path.glob matches dotfiles (._*.txt AppleDouble files, etc.), glob.glob didn't
+    txt_files = sorted(p for p in Path("texts").glob("*.txt") if not p.name.startswith("."))
+    # files are independent, the module-level tables (GROUPS, etc.) are rebuilt
+    # on import in each worker and TITLES is loaded on first use, so this also
+    # works with spawn
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+        results = ex.map(partial(_process_one, rev_volume=rev_volume), txt_files, chunksize=8)
+        for base, nb_pages in tqdm(results, total=len(txt_files)):
+            PAGE_COUNT += nb_pages
 
 if __name__ == '__main__':
     #main()
@@ -1,13 +1,14 @@
 import os
 import rdflib
-from rdflib import Literal, Graph, Dataset
-from rdflib.namespace import RDF, RDFS, SKOS, OWL, Namespace, NamespaceManager, XSD
+from rdflib import Literal, Dataset, URIRef, BNode
+from rdflib.namespace import RDF, RDFS, SKOS, OWL, Namespace, XSD
 from datetime import datetime
-import random
-import string
+import base64
 import csv
 import hashlib
+import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
 """
 I have a file "ALL catalog - Catalog.csv" with no header line. Let's refer to its columns as A, B, C, D, etc. for the sake of this prompt
@@ -37,7 +38,7 @@ In Python please write a script that:
 leaf rows are rows that are colletions (C in column I) or that have no sub-level. They can happen at any level
 """
 
-IN_ENGLISH = [
+IN_ENGLISH = frozenset({
     "S00200A",
     "S00199A",
     "R0050A",
@@ -50,7 +51,7 @@ IN_ENGLISH = [
     "S00205A",
     "S00036F",
     "S00039F",
-]
+})
 
 PREDEFINED_MW = {
     "S00200A": "MW1AL4",
@@ -136,7 +137,6 @@ GROUPS = {
     "D88299": [["SE00070I1", "SE0070M2"]],
     "D88300": [["SL00070N1", "SL00070I2"]],
     "D04848": [["SE00023M1", "SE00023M2"]],
-    "D04849": [["SL00023N1", "SL00023N2", "S00023N3", "S00023N4"]],
     "D79973": [["R00003E1"], ["R00003E2"], ["R00003E3"]],
     "D50934": [
         ["R0002K", "R0002KH", "R0002G", "R0002NG", "R0002C", "R0002CH", "R0002J", "R0002NY"],
@@ -166,14 +166,14 @@ GROUPS = {
 }
 
 def get_random_id(length = 12):
-    letters = string.ascii_uppercase + string.digits
-    return ''.join(random.choice(letters) for i in range(length))
+    # base32 gives 5 bits per character, in A-Z2-7
+    return base64.b32encode(os.urandom((length*5+7)//8)).decode('ascii')[:length]
 
-def add_id(g, e_lname, allid):
+def add_id(triples, e_lname, allid):
     id_r = BDR["ID"+e_lname[2:]+"_ALL001"]
-    g.add((BDR[e_lname], BF.identifiedBy, id_r))
-    g.add((id_r, RDF.type, BDR.IDALL))
-    g.add((id_r, RDF.value, Literal(allid)))
+    triples.append((BDR[e_lname], P_IDENTIFIED_BY, id_r))
+    triples.append((id_r, P_TYPE, T_IDALL))
+    triples.append((id_r, P_VALUE, Literal(allid)))
 
 def import_outline(allid):
     # 3 cases: 
@@ -195,27 +195,34 @@ def import_outline(allid):
         ofpath = fpath(olname, "outline")
         ds.parse(ofpath, format="trig", publicID=BDG[olname])
         g = ds.graph(BDG[olname])
-    else:
+    triples = []
+    add = triples.append
+    o = BDR[olname]
+    o_adm = BDA[olname]
+    ie = BDR[ielname]
+    rootmw = BDR[rootmwlname]
+    if not only_add_cl:
         # TODO: add outline boilerplate
-        g.add((BDR[olname], BDO.outlineOf, BDR[rootmwlname]))
-        g.add((BDR[olname], RDF.type, BDO.Outline))
-        g.add((BDR[olname], BDO.authorshipStatement, Literal("Initial outline data imported from Asian Legacy Library.", lang="en")))
-        g.add((BDA[olname], RDF.type, ADM.AdminData))
-        g.add((BDA[olname], ADM.adminAbout, BDR[olname]))
-        g.add((BDA[olname], ADM.metadataLegal, BDA.LD_BDRC_CC0))
-        g.add((BDA[olname], ADM.status, BDA.StatusReleased))
-        g.add((BDA[olname], ADM.graphId, BDG[olname]))
-        g.add((BDA[olname], ADM.restrictedInChina, Literal(False)))
+        add((o, P_OUTLINE_OF, rootmw))
+        add((o, P_TYPE, T_OUTLINE))
+        add((o, P_AUTHORSHIP_STATEMENT, AUTHORSHIP_LIT))
+        add((o_adm, P_TYPE, T_ADMIN_DATA))
+        add((o_adm, P_ADMIN_ABOUT, o))
+        add((o_adm, P_METADATA_LEGAL, R_LD_BDRC_CC0))
+        add((o_adm, P_STATUS, R_STATUS_RELEASED))
+        add((o_adm, P_GRAPH_ID, BDG[olname]))
+        add((o_adm, P_RESTRICTED_IN_CHINA, FALSE_LIT))
     lge = BDA["LG"+olname+"_"+get_random_id()]
-    g.add((BDA[olname], ADM.logEntry, lge))
-    g.add((lge, RDF.type, ADM.InitialDataImport if not only_add_cl else ADM.UpdateData))
-    g.add((lge, ADM.logAgent, Literal("buda-scripts/imports/ACIP/import_cat.py")))
-    g.add((lge, ADM.logMethod, BDA.BatchMethod))
-    g.add((lge, ADM.logDate, Literal(datetime.now().isoformat(), datatype=XSD.dateTime)))
+    add((o_adm, P_LOG_ENTRY, lge))
+    add((lge, P_TYPE, T_INITIAL_DATA_IMPORT if not only_add_cl else T_UPDATE_DATA))
+    add((lge, P_LOG_AGENT, AGENT_LIT))
+    add((lge, P_LOG_METHOD, R_BATCH_METHOD))
+    add((lge, P_LOG_DATE, Literal(datetime.now().isoformat(), datatype=XSD.dateTime)))
     outline_ids = GROUPS[allid]
     nb_vols = len(outline_ids)
     for vnumminusone, textidlist in enumerate(outline_ids):
         vnum = vnumminusone + 1
+        vnum_lit = int_lit(vnum)
         mwvol = rootmwlname+"_"+olname+"_V"+str(vnum)
         nbtextsinvol = len(textidlist)
         if nbtextsinvol == 1:
@@ -223,61 +230,67 @@ def import_outline(allid):
             mwvol = mwlname = rootmwlname+"_"+olname+"_"+textid
             if textid in MW_OUTLINES:
                 mwvol = MW_OUTLINES[textid]
-            add_id(g, mwvol, textid)
+            add_id(triples, mwvol, textid)
         else:
             textid = allid+"_v"+str(vnum)
             if textid in MW_OUTLINES:
                 mwvol = MW_OUTLINES[textid]
+        mwvol_r = BDR[mwvol]
         if nb_vols > 1:
             cllname = "CL"+mwvol[2:]+"_"+ielname
-            g.remove((BDR[cllname], None, None))
-            g.add((BDR[mwvol], BDO.contentLocation, BDR[cllname]))
-            g.add((BDR[cllname], RDF.type, BDO.ContentLocation))
-            g.add((BDR[cllname], BDO.contentLocationInstance, BDR[ielname]))
-            g.add((BDR[cllname], BDO.contentLocationVolume, Literal(vnum, datatype=XSD.integer)))
-            g.add((BDR[cllname], BDO.contentLocationEndVolume, Literal(vnum, datatype=XSD.integer)))
+            cl = BDR[cllname]
+            g.remove((cl, None, None))
+            add((mwvol_r, P_CONTENT_LOCATION, cl))
+            add((cl, P_TYPE, T_CONTENT_LOCATION))
+            add((cl, P_CONTENT_LOCATION_INSTANCE, ie))
+            add((cl, P_CONTENT_LOCATION_VOLUME, vnum_lit))
+            add((cl, P_CONTENT_LOCATION_END_VOLUME, vnum_lit))
             if not only_add_cl:
                 if nbtextsinvol == 1:
-                    g.add((BDR[mwvol], SKOS.prefLabel, Literal(TITLES[textidlist[0]], lang="bo-x-ewts")))
-                g.add((BDR[mwvol], RDF.type, BDO.Instance))
-                g.add((BDR[mwvol], BDO.partType, BDR.PartTypeVolume))
-                g.add((BDR[mwvol], BDO.inRootInstance, BDR[rootmwlname]))
-                g.add((BDR[mwvol], BDO.partOf, BDR[rootmwlname]))
-                g.add((BDR[mwvol], BDO.partIndex, Literal(vnum, datatype=XSD.integer)))
-                g.add((BDR[mwvol], BDO.partTreeIndex, Literal(str(vnum))))
+                    add((mwvol_r, P_PREF_LABEL, Literal(TITLES[textidlist[0]], lang="bo-x-ewts")))
+                add((mwvol_r, P_TYPE, T_INSTANCE))
+                add((mwvol_r, P_PART_TYPE, R_PART_TYPE_VOLUME))
+                add((mwvol_r, P_IN_ROOT_INSTANCE, rootmw))
+                add((mwvol_r, P_PART_OF, rootmw))
+                add((mwvol_r, P_PART_INDEX, vnum_lit))
+                add((mwvol_r, P_PART_TREE_INDEX, str_lit(vnum)))
         if nbtextsinvol > 1:
             for textnumminusone, textid in enumerate(textidlist):
                 textnum = textnumminusone + 1
+                textnum_lit = int_lit(textnum)
                 mwlname = rootmwlname+"_"+olname+"_"+textid
                 if textid in MW_OUTLINES:
                     mwlname = MW_OUTLINES[textid]
-                add_id(g, mwlname, textid)
+                add_id(triples, mwlname, textid)
                 cllname = "CL"+mwlname[2:]+"_"+ielname
-                g.remove((BDR[cllname], None, None))
-                g.add((BDR[mwlname], BDO.contentLocation, BDR[cllname]))
-                g.add((BDR[cllname], RDF.type, BDO.ContentLocation))
-                g.add((BDR[cllname], BDO.contentLocationInstance, BDR[ielname]))
-                g.add((BDR[cllname], BDO.contentLocationVolume, Literal(vnum, datatype=XSD.integer)))
-                g.add((BDR[cllname], BDO.contentLocationEtext, Literal(textnum, datatype=XSD.integer)))
-                g.add((BDR[cllname], BDO.contentLocationEndEtext, Literal(textnum, datatype=XSD.integer)))
+                mw = BDR[mwlname]
+                cl = BDR[cllname]
+                g.remove((cl, None, None))
+                add((mw, P_CONTENT_LOCATION, cl))
+                add((cl, P_TYPE, T_CONTENT_LOCATION))
+                add((cl, P_CONTENT_LOCATION_INSTANCE, ie))
+                add((cl, P_CONTENT_LOCATION_VOLUME, vnum_lit))
+                add((cl, P_CONTENT_LOCATION_ETEXT, textnum_lit))
+                add((cl, P_CONTENT_LOCATION_END_ETEXT, textnum_lit))
                 if only_add_cl:
                     continue
-                g.add((BDR[mwlname], SKOS.prefLabel, Literal(TITLES[textid], lang="bo-x-ewts")))
-                g.add((BDR[mwlname], RDF.type, BDO.Instance))
-                g.add((BDR[mwlname], BDO.partType, BDR.PartTypeText))
-                g.add((BDR[mwlname], BDO.inRootInstance, BDR[rootmwlname]))
-                g.add((BDR[mwlname], BDO.partOf, BDR[mwvol] if nb_vols > 1 else BDR[rootmwlname]))
-                g.add((BDR[mwlname], BDO.partIndex, Literal(textnum, datatype=XSD.integer)))
-                g.add((BDR[mwlname], BDO.partTreeIndex, Literal(str(vnum)+(".%02d" % textnum))))
+                add((mw, P_PREF_LABEL, Literal(TITLES[textid], lang="bo-x-ewts")))
+                add((mw, P_TYPE, T_INSTANCE))
+                add((mw, P_PART_TYPE, R_PART_TYPE_TEXT))
+                add((mw, P_IN_ROOT_INSTANCE, rootmw))
+                add((mw, P_PART_OF, mwvol_r if nb_vols > 1 else rootmw))
+                add((mw, P_PART_INDEX, textnum_lit))
+                add((mw, P_PART_TREE_INDEX, Literal(str(vnum)+(".%02d" % textnum))))
+    ds.addN((s, p, o, g) for s, p, o in triples)
     print("save "+olname)
-    save_file(olname, "outline", ds)
+    save_file(olname, "outline", [(c.identifier, c) for c in ds.graphs() if len(c)])
 
 def get_nb_pgs():
     res = {}
     with open("nbpgs.csv", 'r', encoding='utf-8') as file:
         reader = csv.reader(file)
         for row in reader:
-            res[row[0]] = row[1]
+            res[row[0]] = int(row[1])
     return res
 
 NB_PGS = get_nb_pgs()
@@ -285,87 +298,123 @@ TITLES = {}
 
 def process_catalog(file_path):
     global TITLES
-    # Read the CSV file
+    # Read the CSV file in one streaming pass
     with open(file_path, 'r', encoding='utf-8') as file:
         reader = csv.reader(file)
-        rows = list(reader)
-    
+        leaves = list(iter_leaves(iter_with_titles(reader)))
+    # rows are independent, each one writes its own files; the module-level
+    # tables are rebuilt on import in each worker, only the log date has to
+    # be shared so that it's the same in all the files
+    with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=_init_worker, initargs=(NOW_LIT,)) as ex:
+        for _ in ex.map(_import_leaf, leaves, chunksize=64):
+            pass
+    # the outlines need the titles of rows that can come after the collection,
+    # so they are imported once the whole catalog has been read
+    for row, parent_topic_ids, is_collection in leaves:
+        if is_collection:
+            import_outline(row[12])
+
+def _init_worker(now_lit):
+    global NOW_LIT
+    NOW_LIT = now_lit
+
+def _import_leaf(leaf):
+    row, parent_topic_ids, is_collection = leaf
+    import_row(row, parent_topic_ids)
+
+def iter_with_titles(rows):
     # filling the titles (we have to do it separately for the outlines)
     for row in rows:
         TITLES[row[12]] = row[9]
-    # Process the tree structure
-    process_tree(rows, 0, len(rows), [], 0)
-
-def process_tree(rows, start_idx, end_idx, parent_topic_ids, current_level):
-    i = start_idx
-    while i < end_idx:
-        row = rows[i]
-        
-        # Determine the level of this row (which column has 'X')
-        row_level = None
-        for level in range(7):  # Columns A to G (0 to 6)
-            if row[level] == 'X':
-                row_level = level
-                break
+        yield row
+
+def get_row_level(row):
+    # Determine the level of this row (which column has 'X')
+    try:
+        return row.index('X', 0, 7)
+    except ValueError:
+        return None
+
+def iter_leaves(rows):
+    """
+    Goes through the rows once, yields (row, parent_topic_ids, is_collection)
+    for each leaf row, in catalog order.
+
+    Only the last open node of each level is kept, and a row is only known to
+    be a leaf when the next row at the same level or above comes (or its first
+    child, if it's not a leaf).
+    """
+    # (level, topic ids for the children) of the open branch nodes,
+    # topic ids are None for collections, whose sub-rows are ignored
+    stack = []
+    # (row, level, parent_topic_ids, row_types) of a row that can still get children
+    pending = None
+    for row in rows:
+        row_level = get_row_level(row)
         
-        # Skip if we couldn't determine the level or it's not at the expected level
-        if row_level is None or row_level != current_level:
-            i += 1
+        # Skip if we couldn't determine the level
+        if row_level is None:
             continue
-        
-        # Get the type from column I (index 8)
-        row_type = row[8] if len(row) > 8 else ""
-        
-        topic_id = None
-        if "Auth" not in row[8] and "X" not in row[8] and "C" not in row[8]:
-            # Get the topic ID from column N (index 13)
-            topic_id = row[13] if len(row) > 13 else None
-        
-        # Create a list of all parent topic IDs plus this one if it exists
-        current_topic_ids = parent_topic_ids.copy()
-        
-        # Check if this is a leaf node
-        is_collection = "C" in row_type.split(",") if row_type else False
-        
-        # Find the next row at the same or lower level
-        next_same_level_idx = end_idx
-        for j in range(i + 1, end_idx):
-            for level in range(7):
-                if rows[j][level] == 'X':
-                    if level <= row_level:
-                        next_same_level_idx = j
-                        break
-                    break
-            if next_same_level_idx != end_idx:
-                break
-        
-        # Check if this is a leaf (either explicitly a collection or has no children)
-        has_children = False
-        if i + 1 < next_same_level_idx:
-            for j in range(i + 1, next_same_level_idx):
-                for level in range(7):
-                    if rows[j][level] == 'X' and level == row_level + 1:
-                        has_children = True
-                        break
-                if has_children:
-                    break
-        
-        is_leaf = is_collection or not has_children
-        
-        if is_leaf:
-            # This is a leaf node, call import_row
-            import_row(row, current_topic_ids)
-            if is_collection:
-                import_outline(row[12])
-        elif not is_collection:
-            # This is a branch node, process its children
-            if topic_id:
-                for topic_id_ind in topic_id.split(","):
-                    current_topic_ids.append(topic_id_ind)
-            process_tree(rows, i + 1, next_same_level_idx, current_topic_ids, current_level + 1)
-        
-        # Move to the next node at this level
-        i = next_same_level_idx
+
+        if pending is not None:
+            p_row, p_level, p_parent_topic_ids, p_row_types = pending
+            if row_level == p_level + 1:
+                # This is a branch node, the next rows are its children.
+                # The topic id lists are never modified once built, so a
+                # node without topic id just shares the list of its parent
+                current_topic_ids = p_parent_topic_ids
+                topic_id = get_topic_id(p_row, p_row_types)
+                if topic_id:
+                    current_topic_ids = p_parent_topic_ids + topic_id.split(",")
+                stack.append((p_level, current_topic_ids))
+                pending = None
+            elif row_level <= p_level:
+                # This is a leaf node
+                yield p_row, p_parent_topic_ids, False
+                pending = None
+            else:
+                # deeper than a child of the pending row, ignored in both cases
+                continue
+
+        while stack and stack[-1][0] >= row_level:
+            stack.pop()
+
+        # Skip if it's not at the expected level
+        if stack:
+            parent_level, parent_topic_ids = stack[-1]
+            if parent_topic_ids is None or row_level != parent_level + 1:
+                continue
+        elif row_level != 0:
+            continue
+        else:
+            parent_topic_ids = []
+
+        row_types = get_row_types(row)
+
+        if "C" in row_types:
+            # collections are leaves, we ignore all sub-rows
+            yield row, parent_topic_ids, True
+            stack.append((row_level, None))
+        else:
+            pending = (row, row_level, parent_topic_ids, row_types)
+
+    if pending is not None:
+        yield pending[0], pending[2], False
+
+def get_row_types(row):
+    # the types in column I (index 8) are comma-separated codes
+    if len(row) > 8 and row[8]:
+        return frozenset(t.strip() for t in row[8].split(","))
+    return frozenset()
+
+# rows of these types don't give their topic to their children
+_IGNORE_TYPES = frozenset({"Auth", "X", "C"})
+
+def get_topic_id(row, row_types):
+    if row_types.isdisjoint(_IGNORE_TYPES):
+        # Get the topic ID from column N (index 13)
+        return row[13] if len(row) > 13 else None
+    return None
 
 GIT_ROOT = "../../../tbrc-ttl/"
 if len(sys.argv) > 1:
@@ -391,16 +440,93 @@ BDO = Namespace("http://purl.bdrc.io/ontology/core/")
 BDA = Namespace("http://purl.bdrc.io/admindata/")
 ADM = Namespace("http://purl.bdrc.io/ontology/admin/")
 
-NSM = NamespaceManager(Graph())
-NSM.bind("bdr", BDR)
-NSM.bind("bdg", BDG)
-NSM.bind("bdo", BDO)
-NSM.bind("bf", BF)
-NSM.bind("bda", BDA)
-NSM.bind("adm", ADM)
-NSM.bind("skos", SKOS)
-NSM.bind("owl", OWL)
-NSM.bind("rdfs", RDFS)
+
+# terms used for every entity, built once
+P_ACCESS = ADM.access
+P_ADMIN_ABOUT = ADM.adminAbout
+P_AGENT = BDO.agent
+P_ALT_LABEL = SKOS.altLabel
+P_ARCHIVE_FILES_ACCESS = ADM.archiveFilesAccess
+P_AUTHORSHIP_STATEMENT = BDO.authorshipStatement
+P_BIBLIO_NOTE = BDO.biblioNote
+P_CONTENT_LOCATION = BDO.contentLocation
+P_CONTENT_LOCATION_END_ETEXT = BDO.contentLocationEndEtext
+P_CONTENT_LOCATION_END_VOLUME = BDO.contentLocationEndVolume
+P_CONTENT_LOCATION_ETEXT = BDO.contentLocationEtext
+P_CONTENT_LOCATION_INSTANCE = BDO.contentLocationInstance
+P_CONTENT_LOCATION_VOLUME = BDO.contentLocationVolume
+P_CREATOR = BDO.creator
+P_ETEXT_INFO = BDO.etextInfo
+P_EXTENT_STATEMENT = BDO.extentStatement
+P_GRAPH_ID = ADM.graphId
+P_IDENTIFIED_BY = BF.identifiedBy
+P_INSTANCE_HAS_REPRODUCTION = BDO.instanceHasReproduction
+P_INSTANCE_HAS_VOLUME = BDO.instanceHasVolume
+P_INSTANCE_OF = BDO.instanceOf
+P_IN_COLLECTION = BDO.inCollection
+P_IN_ROOT_INSTANCE = BDO.inRootInstance
+P_LANGUAGE = BDO.language
+P_LOG_AGENT = ADM.logAgent
+P_LOG_DATE = ADM.logDate
+P_LOG_ENTRY = ADM.logEntry
+P_LOG_METHOD = ADM.logMethod
+P_METADATA_LEGAL = ADM.metadataLegal
+P_NUMBER_OF_VOLUMES = BDO.numberOfVolumes
+P_OUTLINE_OF = BDO.outlineOf
+P_PART_INDEX = BDO.partIndex
+P_PART_OF = BDO.partOf
+P_PART_TREE_INDEX = BDO.partTreeIndex
+P_PART_TYPE = BDO.partType
+P_PREF_LABEL = SKOS.prefLabel
+P_RESTRICTED_IN_CHINA = ADM.restrictedInChina
+P_ROLE = BDO.role
+P_SOURCE_FILES_ACCESS = ADM.sourceFilesAccess
+P_STATUS = ADM.status
+P_TYPE = RDF.type
+P_VALUE = RDF.value
+P_VOLUME_NUMBER = BDO.volumeNumber
+P_WORK_IS_ABOUT = BDO.workIsAbout
+
+T_ADMIN_DATA = ADM.AdminData
+T_AGENT_AS_CREATOR = BDO.AgentAsCreator
+T_CONTENT_LOCATION = BDO.ContentLocation
+T_ETEXT_INSTANCE = BDO.EtextInstance
+T_ETEXT_VOLUME = BDO.EtextVolume
+T_IDALL = BDR.IDALL
+T_INITIAL_DATA_IMPORT = ADM.InitialDataImport
+T_INSTANCE = BDO.Instance
+T_OUTLINE = BDO.Outline
+T_UPDATE_DATA = ADM.UpdateData
+T_WORK = BDO.Work
+
+R_ACCESS_OPEN = BDA.AccessOpen
+R_ACCESS_SAME_AS_ONLINE = BDA.AccessSameAsOnline
+R_BATCH_METHOD = BDA.BatchMethod
+R_LANG_BO = BDR.LangBo
+R_LANG_EN = BDR.LangEn
+R_LD_BDRC_CC0 = BDA.LD_BDRC_CC0
+R_PART_TYPE_TEXT = BDR.PartTypeText
+R_PART_TYPE_VOLUME = BDR.PartTypeVolume
+R_PR1ER12 = BDR.PR1ER12
+R_R0ER0019 = BDR.R0ER0019
+R_STATUS_RELEASED = BDA.StatusReleased
+
+# literals used for every entity
+AGENT_LIT = Literal("buda-scripts/imports/ACIP/import_cat.py")
+FALSE_LIT = Literal(False)
+ETEXT_INFO_LIT = Literal("Etext kindly provided by the Asian Legacy Library (ALL). BDRC would like to express its gratitude to ALL for their generous support and for making available these precious texts for users around the world.", lang="en")
+BIBLIO_NOTE_LIT = Literal("Digital version in the ALL / ACIP database", lang="en")
+AUTHORSHIP_LIT = Literal("Initial outline data imported from Asian Legacy Library.", lang="en")
+
+# small integers (volume and text numbers, etc.)
+_INT_LITS = [Literal(i, datatype=XSD.integer) for i in range(64)]
+_INT_STR_LITS = [Literal(str(i)) for i in range(64)]
+
+def int_lit(i):
+    return _INT_LITS[i] if 0 <= i < 64 else Literal(i, datatype=XSD.integer)
+
+def str_lit(i):
+    return _INT_STR_LITS[i] if 0 <= i < 64 else Literal(str(i))
 
 def bind_prefixes(g):
     g.bind("bdr", BDR)
@@ -414,21 +540,93 @@ def bind_prefixes(g):
     g.bind("rdf", RDF)
     g.bind("rdfs", RDFS)
 
-def get_random_id(length = 12):
-    letters = string.ascii_uppercase + string.digits
-    return ''.join(random.choice(letters) for i in range(length))
+# directories already created by fpath
+_MADE_DIRS = set()
 
 def fpath(e_lname, datatype):
     md5 = hashlib.md5(str.encode(e_lname))
     two = md5.hexdigest()[:2]
-    os.makedirs(GIT_ROOT+datatype+"s"+GIT_REPO_SUFFIX+"/"+two+"/", exist_ok=True)
-    filepathstr = GIT_ROOT+datatype+"s"+GIT_REPO_SUFFIX+"/"+two+"/"+e_lname+".trig"
+    dirpathstr = GIT_ROOT+datatype+"s"+GIT_REPO_SUFFIX+"/"+two+"/"
+    if dirpathstr not in _MADE_DIRS:
+        os.makedirs(dirpathstr, exist_ok=True)
+        _MADE_DIRS.add(dirpathstr)
+    filepathstr = dirpathstr+e_lname+".trig"
     return filepathstr
 
-def save_file(e_lname, datatype, ds):
+# set to False to go through the rdflib TriG serializer instead (slow, but
+# useful to check the output of write_trig_fast)
+FAST_TRIG = True
+
+TRIG_PREFIXES = {
+    "bdr": BDR,
+    "bdo": BDO,
+    "bda": BDA,
+    "bdg": BDG,
+    "bf": BF,
+    "adm": ADM,
+    "skos": SKOS,
+    "owl": OWL,
+    "rdf": RDF,
+    "rdfs": RDFS,
+    "xsd": XSD,
+}
+TRIG_HEADER = "".join("@prefix %s: <%s> .\n" % (p, ns) for p, ns in TRIG_PREFIXES.items()) + "\n"
+_TRIG_NS = {str(ns): p for p, ns in TRIG_PREFIXES.items()}
+_TRIG_LOCAL_RE = re.compile(r"[A-Za-z0-9_][A-Za-z0-9_-]*")
+_TRIG_ESCAPES = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n", "\r": "\\r"})
+
+def trig_term(t):
+    if isinstance(t, Literal):
+        res = '"' + str(t).translate(_TRIG_ESCAPES) + '"'
+        if t.language:
+            return res + "@" + t.language
+        if t.datatype:
+            return res + "^^" + trig_term(t.datatype)
+        return res
+    if isinstance(t, BNode):
+        # blank nodes can come from the existing outlines parsed in import_outline
+        return "_:" + t
+    if not isinstance(t, URIRef):
+        raise TypeError("cannot write %r in TriG" % (t,))
+    i = max(t.rfind("/"), t.rfind("#")) + 1
+    prefix = _TRIG_NS.get(t[:i])
+    if prefix is not None and _TRIG_LOCAL_RE.fullmatch(t, i):
+        return prefix + ":" + t[i:]
+    return "<" + t + ">"
+
+def write_trig_fast(filepathstr, graphs):
+    """
+    writes graphs (a list of (graph IRI, triples) pairs) in TriG, with
+    the triples grouped and sorted by subject so that the files are stable
+    from one run to the next
+    """
+    with open(filepathstr, "w", encoding="utf-8") as f:
+        f.write(TRIG_HEADER)
+        for graph_iri, triples in graphs:
+            by_subject = {}
+            for s, p, o in triples:
+                by_subject.setdefault(trig_term(s), set()).add(trig_term(p) + " " + trig_term(o))
+            f.write(trig_term(graph_iri) + " {\n")
+            for s in sorted(by_subject):
+                f.write("    " + s + " " + " ;\n        ".join(sorted(by_subject[s])) + " .\n")
+            f.write("}\n")
+
+def save_file(e_lname, datatype, graphs):
+    """
+    graphs is a list of (graph IRI, triples) pairs
+    """
     filepathstr = fpath(e_lname, datatype)
     print(filepathstr)
-    ds.serialize(filepathstr, format="trig")
+    if not FAST_TRIG:
+        ds = Dataset()
+        bind_prefixes(ds)
+        for graph_iri, triples in graphs:
+            g = ds.graph(graph_iri)
+            for t in triples:
+                g.add(t)
+        ds.serialize(filepathstr, format="trig")
+        return
+    write_trig_fast(filepathstr, graphs)
 
 NOW_LIT = Literal(datetime.now().isoformat(), datatype=XSD.dateTime)
 LGE = BDA["LG0AL0"]
@@ -452,36 +650,35 @@ def import_row(row, parent_topic_ids):
             for i in range(nb_vols):
                 vols.append("VE"+default_id+("_%04d" % (i+1)))
     # IE
-    adm = BDA[ie_lname]
-    ds = Dataset()
-    ds.namespace_manager = NSM
-    g = ds.graph(BDG[ie_lname])
-    bind_prefixes(ds)
-    add_id(g, ie_lname, row_id)
-    g.add((adm, RDF.type, ADM.AdminData))
-    g.add((adm, ADM.adminAbout, BDR[ie_lname]))
-    g.add((adm, ADM.status, BDA.StatusReleased))
-    g.add((adm, ADM.metadataLegal, BDA.LD_BDRC_CC0))
-    g.add((adm, ADM.access, BDA.AccessOpen))
-    g.add((adm, ADM.archiveFilesAccess, BDA.AccessSameAsOnline))
-    g.add((adm, ADM.sourceFilesAccess, BDA.AccessSameAsOnline))
-    g.add((adm, ADM.graphId, BDG[ie_lname]))
-    g.add((adm, ADM.restrictedInChina, Literal(False)))
-    g.add((adm, ADM.logEntry, LGE))
-    g.add((LGE, RDF.type, ADM.InitialDataImport))
-    g.add((LGE, ADM.logAgent, Literal("buda-scripts/imports/ACIP/import_cat.py")))
-    g.add((LGE, ADM.logMethod, BDA.BatchMethod))
-    g.add((LGE, ADM.logDate, NOW_LIT))
     ie = BDR[ie_lname]
-    g.add((ie, BDO.inCollection, BDR.PR1ER12))
-    g.add((ie, RDF.type, BDO.EtextInstance))
-    g.add((ie, BDO.etextInfo, Literal("Etext kindly provided by the Asian Legacy Library (ALL). BDRC would like to express its gratitude to ALL for their generous support and for making available these precious texts for users around the world.", lang="en")))
+    adm = BDA[ie_lname]
+    ie_g = BDG[ie_lname]
+    triples = []
+    add = triples.append
+    add_id(triples, ie_lname, row_id)
+    add((adm, P_TYPE, T_ADMIN_DATA))
+    add((adm, P_ADMIN_ABOUT, ie))
+    add((adm, P_STATUS, R_STATUS_RELEASED))
+    add((adm, P_METADATA_LEGAL, R_LD_BDRC_CC0))
+    add((adm, P_ACCESS, R_ACCESS_OPEN))
+    add((adm, P_ARCHIVE_FILES_ACCESS, R_ACCESS_SAME_AS_ONLINE))
+    add((adm, P_SOURCE_FILES_ACCESS, R_ACCESS_SAME_AS_ONLINE))
+    add((adm, P_GRAPH_ID, ie_g))
+    add((adm, P_RESTRICTED_IN_CHINA, FALSE_LIT))
+    add((adm, P_LOG_ENTRY, LGE))
+    add((LGE, P_TYPE, T_INITIAL_DATA_IMPORT))
+    add((LGE, P_LOG_AGENT, AGENT_LIT))
+    add((LGE, P_LOG_METHOD, R_BATCH_METHOD))
+    add((LGE, P_LOG_DATE, NOW_LIT))
+    add((ie, P_IN_COLLECTION, R_PR1ER12))
+    add((ie, P_TYPE, T_ETEXT_INSTANCE))
+    add((ie, P_ETEXT_INFO, ETEXT_INFO_LIT))
     for i, v_id in enumerate(vols):
         v = BDR[v_id]
-        g.add((ie, BDO.instanceHasVolume, v))
-        g.add((v, RDF.type, BDO.EtextVolume))
-        g.add((v, BDO.volumeNumber, Literal(i+1, datatype=XSD.integer)))
-    save_file(ie_lname, "einstance", ds)
+        add((ie, P_INSTANCE_HAS_VOLUME, v))
+        add((v, P_TYPE, T_ETEXT_VOLUME))
+        add((v, P_VOLUME_NUMBER, int_lit(i+1)))
+    save_file(ie_lname, "einstance", [(ie_g, triples)])
 
     # MW
     mw_lname = "MW"+default_id
@@ -492,37 +689,36 @@ def import_row(row, parent_topic_ids):
 
     mw = BDR[mw_lname]
     adm = BDA[mw_lname]
-    ds = Dataset()
-    ds.namespace_manager = NSM
-    g = ds.graph(BDG[mw_lname])
-    bind_prefixes(ds)
-    g.add((adm, RDF.type, ADM.AdminData))
-    g.add((adm, ADM.adminAbout, mw))
-    g.add((adm, ADM.status, BDA.StatusReleased))
-    g.add((adm, ADM.metadataLegal, BDA.LD_BDRC_CC0))
-    g.add((adm, ADM.graphId, BDG[mw_lname]))
-    g.add((adm, ADM.restrictedInChina, Literal(False)))
-    g.add((adm, ADM.logEntry, LGE))
-    g.add((LGE, RDF.type, ADM.InitialDataImport))
-    g.add((LGE, ADM.logAgent, Literal("buda-scripts/imports/ACIP/import_cat.py")))
-    g.add((LGE, ADM.logMethod, BDA.BatchMethod))
-    g.add((LGE, ADM.logDate, NOW_LIT))
-    g.add((mw, RDF.type, BDO.Instance))
-    g.add((mw, BDO.instanceHasReproduction, ie))
-    if row_id in NB_PGS and int(NB_PGS[row_id]) > 2:
-        nb_pages = NB_PGS[row_id]
-        g.add((mw, BDO.extentStatement, Literal(f"{nb_pages} pp.")))    
-    g.add((mw, BDO.biblioNote, Literal("Digital version in the ALL / ACIP database", lang="en")))
-    g.add((mw, BDO.numberOfVolumes, Literal(len(vols), datatype=XSD.integer)))
+    mw_g = BDG[mw_lname]
+    triples = []
+    add = triples.append
+    add((adm, P_TYPE, T_ADMIN_DATA))
+    add((adm, P_ADMIN_ABOUT, mw))
+    add((adm, P_STATUS, R_STATUS_RELEASED))
+    add((adm, P_METADATA_LEGAL, R_LD_BDRC_CC0))
+    add((adm, P_GRAPH_ID, mw_g))
+    add((adm, P_RESTRICTED_IN_CHINA, FALSE_LIT))
+    add((adm, P_LOG_ENTRY, LGE))
+    add((LGE, P_TYPE, T_INITIAL_DATA_IMPORT))
+    add((LGE, P_LOG_AGENT, AGENT_LIT))
+    add((LGE, P_LOG_METHOD, R_BATCH_METHOD))
+    add((LGE, P_LOG_DATE, NOW_LIT))
+    add((mw, P_TYPE, T_INSTANCE))
+    add((mw, P_INSTANCE_HAS_REPRODUCTION, ie))
+    nb_pages = NB_PGS.get(row_id)
+    if nb_pages is not None and nb_pages > 2:
+        add((mw, P_EXTENT_STATEMENT, Literal(f"{nb_pages} pp.")))
+    add((mw, P_BIBLIO_NOTE, BIBLIO_NOTE_LIT))
+    add((mw, P_NUMBER_OF_VOLUMES, int_lit(len(vols))))
     if row[9]:
-        g.add((mw, SKOS.prefLabel, Literal(row[9], lang="bo-x-ewts")))
+        add((mw, P_PREF_LABEL, Literal(row[9], lang="bo-x-ewts")))
     if row[10]:
-        g.add((mw, SKOS.altLabel, Literal(row[10], lang="en")))
+        add((mw, P_ALT_LABEL, Literal(row[10], lang="en")))
     other_wa_lname = row[15]
     wa_lname = "WA"+default_id if not other_wa_lname else other_wa_lname
     if row[9]:
-        g.add((mw, BDO.instanceOf, BDR[wa_lname]))
-    save_file(mw_lname, "instance", ds)
+        add((mw, P_INSTANCE_OF, BDR[wa_lname]))
+    save_file(mw_lname, "instance", [(mw_g, triples)])
 
     if other_wa_lname or not row[9]:
         return
@@ -531,40 +727,39 @@ def import_row(row, parent_topic_ids):
     wa_lname = "WA"+default_id
     wa = BDR[wa_lname]
     adm = BDA[wa_lname]
-    ds = Dataset()
-    ds.namespace_manager = NSM
-    g = ds.graph(BDG[wa_lname])
-    bind_prefixes(ds)
-    g.add((adm, RDF.type, ADM.AdminData))
-    g.add((adm, ADM.adminAbout, wa))
-    g.add((adm, ADM.metadataLegal, BDA.LD_BDRC_CC0))
-    g.add((adm, ADM.status, BDA.StatusReleased))
-    g.add((adm, ADM.graphId, BDG[wa_lname]))
-    g.add((adm, ADM.restrictedInChina, Literal(False)))
-    g.add((adm, ADM.logEntry, LGE))
-    g.add((LGE, RDF.type, ADM.InitialDataImport))
-    g.add((LGE, ADM.logAgent, Literal("buda-scripts/imports/ACIP/import_cat.py")))
-    g.add((LGE, ADM.logMethod, BDA.BatchMethod))
-    g.add((LGE, ADM.logDate, NOW_LIT))
-    g.add((wa, RDF.type, BDO.Work))
-    g.add((wa, SKOS.prefLabel, Literal(row[9], lang="bo-x-ewts")))
+    wa_g = BDG[wa_lname]
+    triples = []
+    add = triples.append
+    add((adm, P_TYPE, T_ADMIN_DATA))
+    add((adm, P_ADMIN_ABOUT, wa))
+    add((adm, P_METADATA_LEGAL, R_LD_BDRC_CC0))
+    add((adm, P_STATUS, R_STATUS_RELEASED))
+    add((adm, P_GRAPH_ID, wa_g))
+    add((adm, P_RESTRICTED_IN_CHINA, FALSE_LIT))
+    add((adm, P_LOG_ENTRY, LGE))
+    add((LGE, P_TYPE, T_INITIAL_DATA_IMPORT))
+    add((LGE, P_LOG_AGENT, AGENT_LIT))
+    add((LGE, P_LOG_METHOD, R_BATCH_METHOD))
+    add((LGE, P_LOG_DATE, NOW_LIT))
+    add((wa, P_TYPE, T_WORK))
+    add((wa, P_PREF_LABEL, Literal(row[9], lang="bo-x-ewts")))
     if row[13]:
         p_lname_list = row[13].split(',')
         for i, p_lname in enumerate(p_lname_list):
             aac = BDR["CR"+wa_lname+f"_00{i+1}"]
             p = BDR[p_lname[4:]]
-            g.add((wa, BDO.creator, aac))
-            g.add((aac, BDO.agent, p))
-            g.add((aac, BDO.role, BDR.R0ER0019))
-            g.add((aac, RDF.type, BDO.AgentAsCreator))
-    lang = BDR.LangBo
+            add((wa, P_CREATOR, aac))
+            add((aac, P_AGENT, p))
+            add((aac, P_ROLE, R_R0ER0019))
+            add((aac, P_TYPE, T_AGENT_AS_CREATOR))
+    lang = R_LANG_BO
     if row_id in IN_ENGLISH:
-        lang = BDR.LangEn
-    g.add((wa, BDO.language, lang))
+        lang = R_LANG_EN
+    add((wa, P_LANGUAGE, lang))
     for t_lname in parent_topic_ids:
         t = BDR[t_lname[4:]]
-        g.add((wa, BDO.workIsAbout, t))
-    save_file(wa_lname, "work", ds)
+        add((wa, P_WORK_IS_ABOUT, t))
+    save_file(wa_lname, "work", [(wa_g, triples)])
 
 if __name__ == "__main__":
     # Replace with your actual file path